@@ -1,90 +1,145 @@
 # backend/app/db.py
+import asyncio
 import os
 import time
 from pathlib import Path
 from typing import Any
 
 import psycopg
+from psycopg.conninfo import make_conninfo
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 from dotenv import load_dotenv
-from pgvector.psycopg import register_vector, Vector
+from pgvector.psycopg import register_vector_async, HalfVector, Vector
 
-# Global connection
-_conn: psycopg.Connection | None = None
+# Global connection pool
+_pool: AsyncConnectionPool | None = None
+POOL_MIN_SIZE = 4
 
+# Auto-tuned hnsw.ef_search (used when HNSW_EF_SEARCH is not set)
+_EF_SEARCH_REFRESH_SECS = 300
+_ef_search_auto: int | None = None
+_ef_search_checked_at = 0.0
 
-def init_db(retries: int = 10, delay: int = 3) -> None:
+
+def _conninfo() -> str:
+    return make_conninfo(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        dbname=os.getenv("POSTGRES_DB", "ragdb"),
+        user=os.getenv("POSTGRES_USER", "rag"),
+        password=os.getenv("POSTGRES_PASSWORD", "ragpass"),
+    )
+
+
+async def _configure(conn: psycopg.AsyncConnection) -> None:
+    await register_vector_async(conn)  # ✅ makes psycopg handle `vector` / `halfvec` types
+
+
+async def init_db(retries: int = 10, delay: int = 3) -> None:
     """
-    Connect to Postgres using env vars and ensure pgvector is enabled.
+    Ensure pgvector is enabled, then open the connection pool.
     Retries while the DB container is starting up.
     """
     load_dotenv()
-    global _conn
+    global _pool
     last_err: Exception | None = None
 
     for attempt in range(1, retries + 1):
         try:
-            _conn = psycopg.connect(
-                host=os.getenv("POSTGRES_HOST", "localhost"),
-                port=os.getenv("POSTGRES_PORT", "5432"),
-                dbname=os.getenv("POSTGRES_DB", "ragdb"),
-                user=os.getenv("POSTGRES_USER", "rag"),
-                password=os.getenv("POSTGRES_PASSWORD", "ragpass"),
-                autocommit=True,
-                row_factory=dict_row,
-            )
-            register_vector(_conn)  # ✅ makes psycopg handle `vector` type
-            with _conn.cursor() as cur:
-                cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-            print("✅ Connected to Postgres and pgvector is ready.")
-            return
+            # The extension must exist before pool connections register the vector types
+            async with await psycopg.AsyncConnection.connect(_conninfo(), autocommit=True) as c:
+                await c.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+            break
         except Exception as e:
             last_err = e
             print(f"DB connection failed ({e}); retrying in {delay}s... [{attempt}/{retries}]")
-            time.sleep(delay)
+            await asyncio.sleep(delay)
+    else:
+        raise RuntimeError(f"❌ Could not connect to Postgres after retries: {last_err}")
 
-    raise RuntimeError(f"❌ Could not connect to Postgres after retries: {last_err}")
+    _pool = AsyncConnectionPool(
+        _conninfo(),
+        # prepare_threshold=0: server-side prepare every statement on first use, so
+        # repeated queries (e.g. search_chunks) skip parse/plan on each pooled connection
+        kwargs={"autocommit": True, "row_factory": dict_row, "prepare_threshold": 0},
+        min_size=POOL_MIN_SIZE,
+        max_size=max(POOL_MIN_SIZE, int(os.getenv("PG_POOL_MAX", "16"))),
+        configure=_configure,
+        open=False,
+    )
+    await _pool.open(wait=True)
+    print("✅ Connected to Postgres and pgvector is ready.")
 
 
-def run_schema() -> None:
+async def close_db() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def run_schema() -> None:
     """Execute schema.sql (idempotent)."""
     schema_path = Path(__file__).with_name("schema.sql")
     sql = schema_path.read_text()
-    with _conn.cursor() as cur:
-        cur.execute(sql)
+    async with pool().connection() as c, c.transaction(), c.cursor() as cur:
+        # Opt-in faster (parallel, in-memory) HNSW index builds, scoped to this
+        # transaction. Parallel builds allocate ~maintenance_work_mem of shared
+        # memory, so raising it needs a larger shm_size on the db container.
+        # Unset = server defaults.
+        for setting, env in (
+            ("maintenance_work_mem", "PG_MAINTENANCE_WORK_MEM"),
+            ("max_parallel_maintenance_workers", "PG_MAX_PARALLEL_MAINTENANCE_WORKERS"),
+        ):
+            value = os.getenv(env)
+            if value:
+                await cur.execute("SELECT set_config(%s, %s, true);", (setting, value))
+        await cur.execute(sql, prepare=False)  # multi-statement script can't be prepared
     print("✅ Schema ensured.")
 
 
-def conn() -> psycopg.Connection:
-    if _conn is None:
+def pool() -> AsyncConnectionPool:
+    if _pool is None:
         raise RuntimeError("❌ Database not initialized. Call init_db() first.")
-    return _conn
+    return _pool
+
+
+async def reset_all() -> None:
+    """Delete all documents, chunks and chat history."""
+    async with pool().connection() as c, c.transaction(), c.cursor() as cur:
+        # Delete all chunks first (due to foreign key constraint)
+        await cur.execute("DELETE FROM chunks;")
+        # Delete all documents
+        await cur.execute("DELETE FROM documents;")
+        # Delete all chat history
+        await cur.execute("DELETE FROM chat_history;")
 
 
 # ----------------------------
 # Documents
 # ----------------------------
-def insert_document(doc_name: str) -> int:
-    with _conn.cursor() as cur:
-        cur.execute(
+async def insert_document(doc_name: str) -> int:
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.execute(
             "INSERT INTO documents (doc_name) VALUES (%s) RETURNING id;",
             (doc_name,),
         )
-        return cur.fetchone()["id"]
+        return (await cur.fetchone())["id"]
 
 
-def count_documents() -> int:
-    with _conn.cursor() as cur:
-        cur.execute("SELECT COUNT(*) AS c FROM documents;")
-        return cur.fetchone()["c"]
+async def count_documents() -> int:
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.execute("SELECT COUNT(*) AS c FROM documents;")
+        return (await cur.fetchone())["c"]
 
 
 # ----------------------------
 # Chunks
 # ----------------------------
-def insert_chunk(doc_id: int, content: str, embedding: list[float]) -> int:
-    with _conn.cursor() as cur:
-        cur.execute(
+async def insert_chunk(doc_id: int, content: str, embedding: list[float]) -> int:
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.execute(
             """
             INSERT INTO chunks (doc_id, content, embedding)
             VALUES (%s, %s, %s)
@@ -92,32 +147,148 @@ def insert_chunk(doc_id: int, content: str, embedding: list[float]) -> int:
             """,
             (doc_id, content, embedding),   # ✅ pass embedding directly
         )
-        return cur.fetchone()["id"]
+        return (await cur.fetchone())["id"]
+
+
+async def insert_chunks_bulk(doc_id: int, pairs: list[tuple[str, list[float]]]) -> list[int]:
+    """Insert many (content, embedding) pairs in one pipelined batch; ids keep input order."""
+    if not pairs:
+        return []
+    ids: list[int] = []
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.executemany(
+            """
+            INSERT INTO chunks (doc_id, content, embedding)
+            VALUES (%s, %s, %s)
+            RETURNING id;
+            """,
+            [(doc_id, content, embedding) for content, embedding in pairs],
+            returning=True,
+        )
+        while True:
+            ids.append((await cur.fetchone())["id"])
+            if not cur.nextset():
+                break
+    return ids
+
+
+async def _ef_search(top_k: int) -> int:
+    """
+    HNSW candidate list size for searches. HNSW_EF_SEARCH wins if set;
+    otherwise pick by table size (refreshed every few minutes). Never below
+    top_k, since an HNSW scan returns at most ef_search rows.
+    """
+    env = os.getenv("HNSW_EF_SEARCH")
+    if env:
+        return max(int(env), top_k)
+
+    global _ef_search_auto, _ef_search_checked_at
+    now = time.monotonic()
+    if _ef_search_auto is None or now - _ef_search_checked_at > _EF_SEARCH_REFRESH_SECS:
+        async with pool().connection() as c, c.cursor() as cur:
+            await cur.execute("SELECT reltuples FROM pg_class WHERE relname = 'chunks';")
+            row = await cur.fetchone()
+        rows = row["reltuples"] if row else 0
+        if rows < 100_000:
+            _ef_search_auto = 40
+        elif rows < 1_000_000:
+            _ef_search_auto = 100
+        else:
+            _ef_search_auto = 200
+        _ef_search_checked_at = now
+    return max(_ef_search_auto, top_k)
 
 
-def search_chunks(query_embedding: list[float], top_k: int = 5) -> list[dict[str, Any]]:
-    with _conn.cursor() as cur:
-        cur.execute(
+async def search_chunks(query_embedding: list[float], top_k: int = 5) -> list[dict[str, Any]]:
+    """
+    Nearest chunks by inner product (embeddings are unit-norm, so this ranks
+    like cosine). `<#>` is the negated inner product; `distance` is reported
+    as 1 + that, i.e. cosine distance.
+    """
+    ef_search = await _ef_search(top_k)
+    async with pool().connection() as c, c.transaction(), c.cursor() as cur:
+        # SET LOCAL equivalent: only applies to this transaction
+        await cur.execute("SELECT set_config('hnsw.ef_search', %s, true);", (str(ef_search),))
+        await cur.execute(
             """
-            SELECT id, doc_id, content, (embedding <=> %s::vector) AS distance
+            SELECT id, doc_id, content, 1 + (embedding <#> %s::halfvec) AS distance
             FROM chunks
-            ORDER BY embedding <=> %s::vector
+            ORDER BY embedding <#> %s::halfvec
             LIMIT %s;
             """,
-            (Vector(query_embedding), Vector(query_embedding), top_k),
+            (HalfVector(query_embedding), HalfVector(query_embedding), top_k),
         )
-        rows = cur.fetchall()
+        rows = await cur.fetchall()
     return rows
 
 
+async def search_chunks_batch(query_embeddings: list[list[float]], top_k: int = 5) -> list[list[dict[str, Any]]]:
+    """
+    Search several query vectors in one round-trip. Returns one hit list per
+    query, in input order; the LATERAL subquery still uses the HNSW index.
+    """
+    if not query_embeddings:
+        return []
+    ef_search = await _ef_search(top_k)
+    async with pool().connection() as c, c.transaction(), c.cursor() as cur:
+        await cur.execute("SELECT set_config('hnsw.ef_search', %s, true);", (str(ef_search),))
+        await cur.execute(
+            """
+            SELECT q.qid, s.id, s.doc_id, s.content, s.distance
+            FROM unnest(%s::halfvec[]) WITH ORDINALITY AS q(vec, qid)
+            CROSS JOIN LATERAL (
+                SELECT id, doc_id, content, 1 + (embedding <#> q.vec) AS distance
+                FROM chunks
+                ORDER BY embedding <#> q.vec
+                LIMIT %s
+            ) s
+            ORDER BY q.qid, s.distance;
+            """,
+            ([HalfVector(v) for v in query_embeddings], top_k),
+        )
+        rows = await cur.fetchall()
+
+    results: list[list[dict[str, Any]]] = [[] for _ in query_embeddings]
+    for row in rows:
+        results[row.pop("qid") - 1].append(row)
+    return results
+
+
+# ----------------------------
+# Embedding cache
+# ----------------------------
+async def get_cached_embeddings(hashes: list[bytes]) -> dict[bytes, list[float]]:
+    if not hashes:
+        return {}
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.execute(
+            "SELECT hash, embedding FROM embedding_cache WHERE hash = ANY(%s);",
+            (hashes,),
+        )
+        rows = await cur.fetchall()
+    return {bytes(r["hash"]): r["embedding"].tolist() for r in rows}
+
+
+async def insert_cached_embeddings(pairs: list[tuple[bytes, list[float]]]) -> None:
+    if not pairs:
+        return
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.executemany(
+            """
+            INSERT INTO embedding_cache (hash, embedding)
+            VALUES (%s, %s)
+            ON CONFLICT (hash) DO NOTHING;
+            """,
+            [(h, Vector(v)) for h, v in pairs],
+        )
 
 
 # ----------------------------
 # Chat history
 # ----------------------------
-def insert_chat(session_id: str, role: str, message: str) -> int:
-    with _conn.cursor() as cur:
-        cur.execute(
+async def insert_chat(session_id: str, role: str, message: str) -> int:
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.execute(
             """
             INSERT INTO chat_history (session_id, role, message)
             VALUES (%s, %s, %s)
@@ -125,12 +296,12 @@ def insert_chat(session_id: str, role: str, message: str) -> int:
             """,
             (session_id, role, message),
         )
-        return cur.fetchone()["id"]
+        return (await cur.fetchone())["id"]
 
 
-def get_chat_history(session_id: str) -> list[dict[str, Any]]:
-    with _conn.cursor() as cur:
-        cur.execute(
+async def get_chat_history(session_id: str) -> list[dict[str, Any]]:
+    async with pool().connection() as c, c.cursor() as cur:
+        await cur.execute(
             """
             SELECT role, message, created_at
             FROM chat_history
@@ -139,4 +310,4 @@ def get_chat_history(session_id: str) -> list[dict[str, Any]]:
             """,
             (session_id,),
         )
-        return cur.fetchall()
+        return await cur.fetchall()
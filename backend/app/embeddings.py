@@ -1,18 +1,112 @@
 # app/embeddings.py
+import asyncio
+import hashlib
 import os
-from openai import OpenAI
+from collections.abc import Iterator
 
-_client_instance = None
+import httpx
+import numpy as np
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from app import db
+from app.tokens import count_tokens
+
+_async_client_instance = None
 EMBED_MODEL = "text-embedding-3-small"  # 1536 dims
+EMBED_BATCH_SIZE = 96  # inputs per embeddings request
+EMBED_BATCH_MAX_TOKENS = 250_000  # tokens per embeddings request (API cap is 300k)
+
+# OpenAI HTTP pool: keep connections warm and reuse them
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+# Retries done by the SDK itself (429/5xx), with backoff that honours Retry-After
+OPENAI_MAX_RETRIES = 4
+
+def get_async_client() -> AsyncOpenAI:
+    """Return a cached AsyncOpenAI client instance."""
+    global _async_client_instance
+    if _async_client_instance is None:
+        _async_client_instance = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(http2=True, limits=_HTTP_LIMITS),
+        )
+    return _async_client_instance
+
+def _batches(texts: list[str]) -> list[list[str]]:
+    """Group texts into requests of at most EMBED_BATCH_SIZE inputs and EMBED_BATCH_MAX_TOKENS tokens."""
+    batches: list[list[str]] = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        # A token is at least one UTF-8 byte, so byte length bounds the token count;
+        # only tokenize batches that might exceed the budget
+        if sum(len(t.encode("utf-8")) for t in batch) <= EMBED_BATCH_MAX_TOKENS:
+            batches.append(batch)
+        else:
+            batches.extend(_batches_by_tokens(batch))
+    return batches
+
+def _batches_by_tokens(texts: list[str]) -> Iterator[list[str]]:
+    batch: list[str] = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if batch and (len(batch) == EMBED_BATCH_SIZE or batch_tokens + tokens > EMBED_BATCH_MAX_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def normalize(vec: list[float]) -> list[float]:
+    """L2-normalize a vector so inner product equals cosine similarity."""
+    v = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return (v / norm).tolist() if norm else v.tolist()
+
+async def _embed_batch_async(batch: list[str]) -> list[list[float]]:
+    """One embeddings request (rate-limit backoff is handled by the client's retries)."""
+    resp = await get_async_client().embeddings.create(model=EMBED_MODEL, input=batch)
+    return [normalize(d.embedding) for d in sorted(resp.data, key=lambda d: d.index)]
+
+async def embed_texts_async(texts: list[str]) -> list[list[float]]:
+    """Embed many texts with batches sent concurrently (EMBED_CONCURRENCY), preserving order."""
+    semaphore = asyncio.Semaphore(int(os.getenv("EMBED_CONCURRENCY", "4")))
+
+    async def run(batch: list[str]) -> list[list[float]]:
+        async with semaphore:
+            return await _embed_batch_async(batch)
+
+    # Token counting is CPU work: keep it off the event loop
+    batches = await asyncio.get_running_loop().run_in_executor(None, _batches, texts)
+    results = await asyncio.gather(*(run(b) for b in batches))  # gather keeps batch order
+    return [vec for batch_vectors in results for vec in batch_vectors]
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(f"{EMBED_MODEL}\0{text}".encode()).digest()
+
+def _missing_texts(hashes: list[bytes], texts: list[str], cached: dict) -> dict[bytes, str]:
+    """Distinct texts (by hash) not yet in the cache, so each is embedded once."""
+    missing: dict[bytes, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in cached:
+            missing.setdefault(h, t)
+    return missing
+
+async def embed_text_cached_async(text: str) -> list[float]:
+    """Embed one text, served from the embedding_cache table when possible."""
+    return (await embed_texts_cached_async([text]))[0]
+
+async def embed_texts_cached_async(texts: list[str]) -> list[list[float]]:
+    """Like embed_texts_async, but only sends texts missing from embedding_cache to OpenAI."""
+    hashes = [_text_hash(t) for t in texts]
+    cached = await db.get_cached_embeddings(list(set(hashes)))
+
+    missing = _missing_texts(hashes, texts, cached)
+    if missing:
+        fresh = await embed_texts_async(list(missing.values()))
+        new_pairs = list(zip(missing.keys(), fresh))
+        await db.insert_cached_embeddings(new_pairs)
+        cached.update(new_pairs)
 
-def get_client() -> OpenAI:
-    """Return a cached OpenAI client instance."""
-    global _client_instance
-    if _client_instance is None:
-        _client_instance = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _client_instance
-
-def embed_text(text: str) -> list[float]:
-    """Embed a single text string and return the vector."""
-    resp = get_client().embeddings.create(model=EMBED_MODEL, input=text)
-    return resp.data[0].embedding
+    return [cached[h] for h in hashes]
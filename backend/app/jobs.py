@@ -0,0 +1,127 @@
+# app/jobs.py
+"""
+Background PDF ingest.
+
+/upload-pdf enqueues a job and returns immediately; a few worker tasks drain
+the queue. PDF parsing/chunking is CPU-bound, so it runs in a thread pool to
+keep the event loop free. Job state lives in memory (one API process).
+"""
+import asyncio
+import os
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO
+
+from app import db, qvcache
+from app.embeddings import embed_texts_cached_async
+from app.pdf_processor import process_pdf_for_rag
+
+NUM_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+MAX_JOBS_KEPT = 1000  # finished jobs retained for polling
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_executor = ThreadPoolExecutor(max_workers=NUM_WORKERS, thread_name_prefix="pdf")
+_jobs: dict[str, dict[str, Any]] = {}
+
+
+class QueueFullError(Exception):
+    """Raised when too many uploads are already waiting."""
+
+
+def start() -> None:
+    """Create the queue and worker tasks (call from the app's startup event)."""
+    global _queue
+    _queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    for _ in range(NUM_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def stop() -> None:
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    # Close spooled upload files of jobs that never ran
+    while _queue is not None and not _queue.empty():
+        _, pdf_file, _ = _queue.get_nowait()
+        pdf_file.close()
+        _queue.task_done()
+    _executor.shutdown(wait=False)
+
+
+def submit(pdf_file: BinaryIO, filename: str) -> dict[str, Any]:
+    """Queue a PDF file for ingest and return its job record; the job closes the file."""
+    if _queue is None:
+        raise RuntimeError("❌ Job queue not started. Call jobs.start() first.")
+    job_id = uuid.uuid4().hex
+    job = {"job_id": job_id, "status": "queued", "filename": filename, "doc_id": None, "error": None}
+    try:
+        _queue.put_nowait((job_id, pdf_file, filename))
+    except asyncio.QueueFull:
+        raise QueueFullError("Too many uploads in progress, try again later")
+    _jobs[job_id] = job
+    _trim_jobs()
+    return job
+
+
+def get(job_id: str) -> dict[str, Any] | None:
+    return _jobs.get(job_id)
+
+
+def _trim_jobs() -> None:
+    """Forget the oldest finished jobs once more than MAX_JOBS_KEPT are stored."""
+    excess = len(_jobs) - MAX_JOBS_KEPT
+    if excess <= 0:
+        return
+    for job_id in [j for j, job in _jobs.items() if job["status"] in ("done", "failed")][:excess]:
+        del _jobs[job_id]
+
+
+async def _worker() -> None:
+    while True:
+        job_id, pdf_file, filename = await _queue.get()
+        job = _jobs[job_id]
+        job["status"] = "processing"
+        try:
+            job.update(await _ingest_pdf(pdf_file, filename))
+            job["status"] = "done"
+        except ValueError as e:
+            # PDF processing errors
+            job.update(status="failed", error=str(e))
+        except Exception as e:
+            traceback.print_exc()
+            job.update(status="failed", error=f"PDF upload error: {e}")
+        finally:
+            pdf_file.close()
+            _queue.task_done()
+
+
+async def _ingest_pdf(pdf_file: BinaryIO, filename: str) -> dict[str, Any]:
+    """Extract, chunk, embed and store one PDF."""
+    loop = asyncio.get_running_loop()
+
+    # Process PDF (extract text and create chunks) off the event loop
+    extracted_text, chunks = await loop.run_in_executor(
+        _executor, process_pdf_for_rag, pdf_file, filename
+    )
+
+    # Create document record
+    doc_id = await db.insert_document(filename)
+
+    # Generate embeddings for all chunks (batched, several requests in flight)
+    contents = [chunk.page_content for chunk in chunks]
+    embeddings = await embed_texts_cached_async(contents)
+
+    # Store chunks in database
+    chunk_ids = await db.insert_chunks_bulk(doc_id, list(zip(contents, embeddings)))
+    qvcache.clear()
+
+    return {
+        "doc_id": doc_id,
+        "chunks_created": len(chunk_ids),
+        "text_length": len(extracted_text),
+        "chunk_ids": chunk_ids,
+    }
@@ -2,15 +2,15 @@
 from __future__ import annotations
 
 import os
+import tempfile
 from typing import List
 
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
-from app import db
-from app.embeddings import embed_text
-from app.pdf_processor import process_pdf_for_rag
+from app import db, jobs, qvcache
+from app.embeddings import embed_text_cached_async, get_async_client, normalize
 
 
 # ----------------------------
@@ -38,34 +38,36 @@ app.add_middleware(
 # Lifecycle
 # ----------------------------
 @app.on_event("startup")
-def _startup():
-    db.init_db()
-    db.run_schema()
+async def _startup():
+    await db.init_db()
+    await db.run_schema()
+    jobs.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await jobs.stop()
+    await db.close_db()
 
 
 # ----------------------------
 # Health
 # ----------------------------
 @app.get("/health")
-def health():
+async def health():
     try:
-        doc_count = db.count_documents()
+        doc_count = await db.count_documents()
     except Exception:
         doc_count = None
     return {"ok": True, "service": "api", "version": "0.1.0", "documents": doc_count}
 
 
 @app.delete("/reset-database")
-def reset_database():
+async def reset_database():
     """Reset the entire database - delete all documents and chunks."""
     try:
-        with db.conn().cursor() as cur:
-            # Delete all chunks first (due to foreign key constraint)
-            cur.execute("DELETE FROM chunks;")
-            # Delete all documents
-            cur.execute("DELETE FROM documents;")
-            # Delete all chat history
-            cur.execute("DELETE FROM chat_history;")
+        await db.reset_all()
+        qvcache.clear()
         
         return {
             "message": "Database reset successfully",
@@ -119,20 +121,30 @@ class SearchTextIn(BaseModel):
 # ----------------------------
 # Retrieval-only (vector search)
 # ----------------------------
+async def _search_cached(qvec: List[float], top_k: int):
+    """Vector search through the in-process semantic cache."""
+    hits = qvcache.lookup(qvec, top_k)
+    if hits is None:
+        gen = qvcache.generation()
+        hits = await db.search_chunks(qvec, top_k=top_k)
+        qvcache.insert(qvec, top_k, hits, gen)
+    return hits
+
+
 @app.post("/search-text")
-def search_text(body: SearchTextIn):
+async def search_text(body: SearchTextIn):
     try:
-        qvec = embed_text(body.text)
-        results = db.search_chunks(qvec, top_k=body.top_k)
+        qvec = await embed_text_cached_async(body.text)
+        results = await _search_cached(qvec, body.top_k)
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/search-text error: {e}")
 
 
 @app.post("/search")
-def search_chunks(body: SearchIn):
+async def search_chunks(body: SearchIn):
     try:
-        results = db.search_chunks(body.embedding, top_k=body.top_k)
+        results = await db.search_chunks(normalize(body.embedding), top_k=body.top_k)
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/search error: {e}")
@@ -142,29 +154,31 @@ def search_chunks(body: SearchIn):
 # Documents & Chunks
 # ----------------------------
 @app.post("/documents")
-def create_document(body: DocumentIn):
+async def create_document(body: DocumentIn):
     try:
-        doc_id = db.insert_document(body.doc_name)
+        doc_id = await db.insert_document(body.doc_name)
         return {"doc_id": doc_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/documents error: {e}")
 
 
 @app.post("/chunks")
-def create_chunk(body: ChunkIn):
+async def create_chunk(body: ChunkIn):
     try:
-        chunk_id = db.insert_chunk(body.doc_id, body.content, body.embedding)
+        chunk_id = await db.insert_chunk(body.doc_id, body.content, normalize(body.embedding))
+        qvcache.clear()
         return {"chunk_id": chunk_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/chunks error: {e}")
 
 
 @app.post("/embed-and-chunk")
-def embed_and_chunk(body: EmbedAndChunkIn):
+async def embed_and_chunk(body: EmbedAndChunkIn):
         # embed text server-side, then insert
     try:
-        vec = embed_text(body.content)  # 1536-d vector
-        chunk_id = db.insert_chunk(body.doc_id, body.content, vec)
+        vec = await embed_text_cached_async(body.content)  # 1536-d vector
+        chunk_id = await db.insert_chunk(body.doc_id, body.content, vec)
+        qvcache.clear()
         return {"chunk_id": chunk_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/embed-and-chunk error: {e}")
@@ -174,21 +188,21 @@ def embed_and_chunk(body: EmbedAndChunkIn):
 # Chat history
 # ----------------------------
 @app.post("/chat")
-def add_chat(body: ChatIn):
+async def add_chat(body: ChatIn):
     role = body.role.lower()
     if role not in ("user", "assistant"):
         raise HTTPException(status_code=400, detail="role must be 'user' or 'assistant'")
     try:
-        chat_id = db.insert_chat(body.session_id, role, body.message)
+        chat_id = await db.insert_chat(body.session_id, role, body.message)
         return {"chat_id": chat_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/chat error: {e}")
 
 
 @app.get("/chat/{session_id}")
-def get_chat(session_id: str):
+async def get_chat(session_id: str):
     try:
-        history = db.get_chat_history(session_id)
+        history = await db.get_chat_history(session_id)
         return {"history": history}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"/chat/{session_id} error: {e}")
@@ -197,19 +211,11 @@ def get_chat(session_id: str):
 # ----------------------------
 # Ask (RAG: retrieve + generate)
 # ----------------------------
-def _get_openai_client():
-    from openai import OpenAI
-    key = os.getenv("OPENAI_API_KEY", "")
-    if not key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=key)
-
-
 @app.post("/ask")
-def ask(body: AskIn):
+async def ask(body: AskIn):
     # 1) Embed the question
-    qvec = embed_text(body.question)
-    hits = db.search_chunks(qvec, top_k=body.top_k)
+    qvec = await embed_text_cached_async(body.question)
+    hits = await _search_cached(qvec, body.top_k)
 
     # 2) Return early if nothing found
     if not hits:
@@ -219,7 +225,7 @@ def ask(body: AskIn):
     context = "\n\n".join(f"- {h['content']}" for h in hits)
 
     # 4) Call LLM
-    client = _get_openai_client()
+    client = get_async_client()
     chat_model = os.getenv("CHAT_MODEL", "gpt-4o-mini")
     system_msg = (
         "You are a helpful assistant. Use ONLY the provided context to answer. "
@@ -228,7 +234,7 @@ def ask(body: AskIn):
     user_msg = f"Context:\n{context}\n\nQuestion: {body.question}\nAnswer:"
 
     try:
-        resp = client.chat.completions.create(
+        resp = await client.chat.completions.create(
             model=chat_model,
             messages=[
                 {"role": "system", "content": system_msg},
@@ -253,10 +259,10 @@ def ask(body: AskIn):
 # Debug route (retrieval only)
 # ----------------------------
 @app.post("/ask-debug")
-def ask_debug(body: AskIn):
+async def ask_debug(body: AskIn):
     try:
-        qvec = embed_text(body.question)   # embeds the query
-        hits = db.search_chunks(qvec, top_k=body.top_k)
+        qvec = await embed_text_cached_async(body.question)   # embeds the query
+        hits = await db.search_chunks(qvec, top_k=body.top_k)
         context = "\n\n".join(f"- {h['content']}" for h in hits)
         return {"hits": hits, "context": context}
     except Exception as e:
@@ -268,55 +274,52 @@ def ask_debug(body: AskIn):
 # ----------------------------
 # PDF Upload
 # ----------------------------
-@app.post("/upload-pdf")
+PDF_SPOOL_MAX_MEMORY = 8 << 20  # bytes kept in RAM before spilling to disk
+UPLOAD_READ_CHUNK = 1 << 20
+
+
+@app.post("/upload-pdf", status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
     """
-    Upload and process a PDF file for RAG.
+    Upload a PDF file for RAG processing in the background.
     
     The PDF will be:
     1. Extracted for text content
     2. Chunked into smaller pieces
     3. Embedded using OpenAI
     4. Stored in the vector database
+    
+    Returns a job_id right away; poll GET /jobs/{job_id} for the result.
     """
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
-        # Read file content
-        pdf_bytes = await file.read()
+        # Stream the upload into a spooled temp file (spills to disk past 8 MB)
+        # instead of holding the whole PDF in memory
+        pdf_file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)
+        try:
+            while chunk := await file.read(UPLOAD_READ_CHUNK):
+                pdf_file.write(chunk)
+            pdf_file.seek(0)
+            job = jobs.submit(pdf_file, file.filename)
+        except BaseException:
+            pdf_file.close()
+            raise
+        return {"job_id": job["job_id"], "status": job["status"], "filename": file.filename}
         
-        # Process PDF (extract text and create chunks)
-        extracted_text, chunks = process_pdf_for_rag(pdf_bytes, file.filename)
-        
-        # Create document record
-        doc_id = db.insert_document(file.filename)
-        
-        # Process each chunk
-        chunk_ids = []
-        for chunk in chunks:
-            # Generate embedding for the chunk
-            embedding = embed_text(chunk.page_content)
-            
-            # Store chunk in database
-            chunk_id = db.insert_chunk(doc_id, chunk.page_content, embedding)
-            chunk_ids.append(chunk_id)
-        
-        return {
-            "message": "PDF uploaded and processed successfully",
-            "doc_id": doc_id,
-            "filename": file.filename,
-            "chunks_created": len(chunk_ids),
-            "text_length": len(extracted_text),
-            "chunk_ids": chunk_ids
-        }
-        
-    except ValueError as e:
-        # PDF processing errors
-        raise HTTPException(status_code=400, detail=str(e))
+    except jobs.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        # Other errors
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"PDF upload error: {e}")
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
@@ -1,62 +1,108 @@
 # backend/app/pdf_processor.py
-import io
-from typing import List, Tuple
-from PyPDF2 import PdfReader
+import threading
+from typing import BinaryIO, List, Tuple, Union
+import pypdfium2 as pdfium
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from app.tokens import count_tokens
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+# Sizes are in embedding-model tokens
+DEFAULT_CHUNK_SIZE = 512
+DEFAULT_CHUNK_OVERLAP = 64
+_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# PDFium is not thread-safe; extraction runs on a thread pool, so serialize it
+_PDFIUM_LOCK = threading.Lock()
+
+PdfSource = Union[bytes, BinaryIO]
+
+
+def _make_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=count_tokens,
+        separators=_SEPARATORS
+    )
+
+
+# Built once and shared; splitting is stateless, so this is safe across threads
+_DEFAULT_SPLITTER = _make_splitter(DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP)
+
+
+def _page_text(pdf: pdfium.PdfDocument, index: int) -> str:
+    """Text of one page ("" on failure), freeing native PDFium handles right away."""
+    page = textpage = None
+    try:
+        page = pdf[index]
+        textpage = page.get_textpage()
+        # PDFium uses \r\n line breaks; normalize so the "\n\n" separator matches
+        return textpage.get_text_bounded().replace("\r\n", "\n")
+    except Exception as e:
+        print(f"⚠️ Error extracting page {index + 1}: {e}")
+        return ""
+    finally:
+        if textpage is not None:
+            textpage.close()
+        if page is not None:
+            page.close()
+
+
+def extract_text_from_pdf(pdf_file: PdfSource) -> str:
     """
-    Extract text content from PDF bytes.
+    Extract text content from a PDF.
     
     Args:
-        pdf_bytes: Raw PDF file bytes
+        pdf_file: Raw PDF bytes, or a seekable binary file (read lazily, page by page)
         
     Returns:
         Extracted text content as string
     """
     try:
-        pdf_stream = io.BytesIO(pdf_bytes)
-        reader = PdfReader(pdf_stream)
-        
-        text_content = []
-        for page_num, page in enumerate(reader.pages, 1):
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_file)
             try:
-                page_text = page.extract_text()
-                if page_text.strip():  # Only add non-empty pages
-                    text_content.append(f"--- Page {page_num} ---\n{page_text}")
-            except Exception as e:
-                print(f"⚠️ Error extracting page {page_num}: {e}")
-                continue
+                # Only add non-empty pages
+                text = "\n\n".join(
+                    f"--- Page {page_num} ---\n{page_text}"
+                    for page_num, page_text in enumerate(
+                        (_page_text(pdf, i) for i in range(len(pdf))), 1
+                    )
+                    if page_text.strip()
+                )
+            finally:
+                pdf.close()
         
-        if not text_content:
+        if not text:
             raise ValueError("No text content found in PDF")
             
-        return "\n\n".join(text_content)
+        return text
         
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF: {e}")
 
 
-def chunk_pdf_text(text: str, chunk_size: int = 800, chunk_overlap: int = 120) -> List[Document]:
+def chunk_pdf_text(
+    text: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+) -> List[Document]:
     """
     Split PDF text into chunks for embedding.
     
     Args:
         text: Full text content from PDF
-        chunk_size: Maximum characters per chunk
-        chunk_overlap: Character overlap between chunks
+        chunk_size: Maximum tokens per chunk
+        chunk_overlap: Token overlap between chunks
         
     Returns:
         List of Document objects ready for embedding
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
-    )
+    if (chunk_size, chunk_overlap) == (DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP):
+        splitter = _DEFAULT_SPLITTER
+    else:
+        splitter = _make_splitter(chunk_size, chunk_overlap)
     
     # Create a single document for splitting
     doc = Document(page_content=text, metadata={"source": "uploaded_pdf"})
@@ -65,28 +111,26 @@ def chunk_pdf_text(text: str, chunk_size: int = 800, chunk_overlap: int = 120) -
     return chunks
 
 
-def process_pdf_for_rag(pdf_bytes: bytes, doc_name: str) -> Tuple[str, List[Document]]:
+def process_pdf_for_rag(pdf_file: PdfSource, doc_name: str) -> Tuple[str, List[Document]]:
     """
     Complete PDF processing pipeline: extract text and create chunks.
     
     Args:
-        pdf_bytes: Raw PDF file bytes
+        pdf_file: Raw PDF bytes or a seekable binary file
         doc_name: Name for the document
         
     Returns:
         Tuple of (extracted_text, chunks)
     """
     # Extract text
-    extracted_text = extract_text_from_pdf(pdf_bytes)
+    extracted_text = extract_text_from_pdf(pdf_file)
     
     # Create chunks
     chunks = chunk_pdf_text(extracted_text)
     
-    # Add document metadata to chunks
+    # Add document metadata to chunks (one shared dict, merged into each)
+    meta = {"doc_name": doc_name, "source_type": "pdf_upload"}
     for chunk in chunks:
-        chunk.metadata.update({
-            "doc_name": doc_name,
-            "source_type": "pdf_upload"
-        })
+        chunk.metadata.update(meta)
     
     return extracted_text, chunks
@@ -0,0 +1,97 @@
+# app/qvcache.py
+"""
+Bounded in-process semantic cache for vector search results.
+
+Keys are L2-normalized query embeddings kept in one float32 matrix, so a
+lookup is a single matrix-vector product. A hit requires cosine similarity
+>= SEM_CACHE_TAU and a cached result at least as large as the requested top_k.
+
+clear() bumps a generation counter; callers read generation() before searching
+and pass it to insert(), which drops results computed before the last clear.
+"""
+import os
+import threading
+from typing import Any
+
+import numpy as np
+
+CAPACITY = int(os.getenv("SEM_CACHE_SIZE", "1024"))
+TAU = float(os.getenv("SEM_CACHE_TAU", "0.97"))
+
+_lock = threading.Lock()
+_keys: np.ndarray | None = None            # (CAPACITY, dim) normalized query vectors
+_values: list[tuple[int, list[dict[str, Any]]] | None] = [None] * CAPACITY  # (top_k, hits)
+_last_used = np.zeros(CAPACITY, dtype=np.int64)  # LRU clock per slot (0 = empty)
+_size = 0
+_tick = 0
+_generation = 0
+
+
+def _normalize(vec: list[float]) -> np.ndarray | None:
+    v = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        return None
+    return v / norm
+
+
+def lookup(qvec: list[float], top_k: int) -> list[dict[str, Any]] | None:
+    """Return cached hits for a near-identical query, or None on a miss."""
+    global _tick
+    q = _normalize(qvec)
+    if q is None:
+        return None
+    with _lock:
+        if _size == 0 or _keys is None or _keys.shape[1] != q.shape[0]:
+            return None
+        sims = _keys[:_size] @ q
+        best = int(np.argmax(sims))
+        if sims[best] < TAU:
+            return None
+        cached_k, hits = _values[best]
+        if cached_k < top_k:
+            return None
+        _tick += 1
+        _last_used[best] = _tick
+        return hits[:top_k]
+
+
+def generation() -> int:
+    """Current cache generation; read it before running the search to be cached."""
+    return _generation
+
+
+def insert(qvec: list[float], top_k: int, hits: list[dict[str, Any]], gen: int) -> None:
+    """
+    Cache hits for a query, evicting the least recently used entry when full.
+    Skipped if the cache was cleared since `gen` was read (hits may be stale).
+    """
+    global _keys, _size, _tick
+    q = _normalize(qvec)
+    if q is None or CAPACITY <= 0:
+        return
+    with _lock:
+        if gen != _generation:
+            return
+        if _keys is None or _keys.shape[1] != q.shape[0]:
+            _keys = np.zeros((CAPACITY, q.shape[0]), dtype=np.float32)
+            _size = 0
+        if _size < CAPACITY:
+            slot = _size
+            _size += 1
+        else:
+            slot = int(np.argmin(_last_used))
+        _keys[slot] = q
+        _values[slot] = (top_k, hits)
+        _tick += 1
+        _last_used[slot] = _tick
+
+
+def clear() -> None:
+    """Drop all entries (call whenever the chunks table changes)."""
+    global _size, _generation
+    with _lock:
+        _generation += 1
+        _size = 0
+        _values[:] = [None] * CAPACITY
+        _last_used[:] = 0
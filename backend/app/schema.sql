@@ -9,16 +9,45 @@ CREATE TABLE IF NOT EXISTS documents (
 );
 
 -- Chunks + embeddings (1536 dims matches text-embedding-3-small)
+-- Stored as half precision: half the storage/index size, negligible recall loss
 CREATE TABLE IF NOT EXISTS chunks (
   id SERIAL PRIMARY KEY,
   doc_id INT REFERENCES documents(id) ON DELETE CASCADE,
   content TEXT NOT NULL,
-  embedding VECTOR(1536) NOT NULL
+  embedding HALFVEC(1536) NOT NULL
 );
 
--- Speed up vector search (cosine distance)
-CREATE INDEX IF NOT EXISTS idx_chunks_embedding
-ON chunks USING ivfflat (embedding vector_cosine_ops);
+-- HNSW replaces the earlier ivfflat index, whose lists were trained on an empty table
+DROP INDEX IF EXISTS idx_chunks_embedding;
+
+-- Migrate older databases from VECTOR(1536) to HALFVEC(1536)
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1
+    FROM pg_attribute a
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE a.attrelid = 'chunks'::regclass
+      AND a.attname = 'embedding'
+      AND t.typname = 'vector'
+  ) THEN
+    DROP INDEX IF EXISTS chunks_embedding_hnsw;
+    ALTER TABLE chunks ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536);
+  END IF;
+END $$;
+
+-- Speed up vector search. Embeddings are L2-normalized, so inner product (`<#>`)
+-- ranks like cosine without the per-comparison norm work; replaces the cosine index.
+DROP INDEX IF EXISTS chunks_embedding_hnsw;
+CREATE INDEX IF NOT EXISTS chunks_embedding_hnsw_ip
+ON chunks USING hnsw (embedding halfvec_ip_ops) WITH (m = 24, ef_construction = 128);
+
+-- OpenAI embeddings keyed by SHA-256 of (model, text), to skip re-embedding duplicates
+CREATE TABLE IF NOT EXISTS embedding_cache (
+  hash BYTEA PRIMARY KEY,
+  embedding VECTOR(1536) NOT NULL,
+  created_at TIMESTAMP DEFAULT NOW()
+);
 
 -- Chat history by session
 CREATE TABLE IF NOT EXISTS chat_history (
@@ -28,3 +57,8 @@ CREATE TABLE IF NOT EXISTS chat_history (
   message TEXT NOT NULL,
   created_at TIMESTAMP DEFAULT NOW()
 );
+
+-- Serve get_chat_history's WHERE session_id + ORDER BY created_at from one index
+-- (no INCLUDE (message): long messages would exceed the btree row size limit)
+CREATE INDEX IF NOT EXISTS chat_history_session_created_idx
+ON chat_history (session_id, created_at);
@@ -0,0 +1,18 @@
+# app/tokens.py
+"""Token counting for the embedding model (tiktoken only, no app imports)."""
+import tiktoken
+
+TOKENIZER_MODEL = "text-embedding-3-small"  # keep in sync with embeddings.EMBED_MODEL
+
+_encoding_instance = None
+
+def get_encoding() -> tiktoken.Encoding:
+    """Return the cached tiktoken encoding of the embedding model."""
+    global _encoding_instance
+    if _encoding_instance is None:
+        _encoding_instance = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    return _encoding_instance
+
+def count_tokens(text: str) -> int:
+    """Number of embedding-model tokens in text."""
+    return len(get_encoding().encode(text, disallowed_special=()))
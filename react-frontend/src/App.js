@@ -73,6 +73,20 @@ function App() {
     }
   };
 
+  // Poll a background ingest job until it finishes
+  const waitForJob = async (jobId) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const res = await fetch(`${API_URL}/jobs/${jobId}`);
+      if (!res.ok) {
+        throw new Error(`${res.status} ${res.statusText} — job status unavailable`);
+      }
+      const job = await res.json();
+      if (job.status === "done") return job;
+      if (job.status === "failed") throw new Error(job.error || "processing failed");
+    }
+  };
+
   const uploadPDF = async (file) => {
     setUploadStatus({ visible: true, message: "Uploading PDF...", type: '' });
     setIsLoading(true);
@@ -93,7 +107,9 @@ function App() {
         throw new Error(`${res.status} ${res.statusText} — ${detail}`);
       }
 
-      const data = await res.json();
+      const { job_id } = await res.json();
+      setUploadStatus({ visible: true, message: "Processing PDF...", type: '' });
+      const data = await waitForJob(job_id);
       setUploadStatus({
         visible: true,
         message: `✅ Uploaded "${data.filename}" (doc_id=${data.doc_id}), chunks created: ${data.chunks_created}`,
@@ -7,6 +7,7 @@ This script tests the PDF upload endpoint without requiring the full Docker setu
 import requests
 import json
 import os
+import time
 from pathlib import Path
 
 # Configuration
@@ -69,6 +70,16 @@ def create_test_pdf():
         print("✅ Created test text file (rename to .pdf for actual PDF testing)")
         return False
 
+def wait_for_job(job_id, timeout=120):
+    """Poll the background ingest job until it finishes or times out."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = requests.get(f"{API_BASE_URL}/jobs/{job_id}").json()
+        if data.get("status") in ("done", "failed"):
+            return data
+        time.sleep(1)
+    return {"status": "failed", "error": "timed out waiting for job"}
+
 def test_pdf_upload():
     """Test PDF upload endpoint."""
     if not Path(TEST_PDF_PATH).exists():
@@ -80,8 +91,13 @@ def test_pdf_upload():
             files = {'file': (TEST_PDF_PATH, f, 'application/pdf')}
             response = requests.post(f"{API_BASE_URL}/upload-pdf", files=files)
         
-        if response.status_code == 200:
-            data = response.json()
+        if response.status_code == 202:
+            job_id = response.json()["job_id"]
+            print(f"⏳ PDF queued for processing (job {job_id})")
+            data = wait_for_job(job_id)
+            if data.get("status") != "done":
+                print(f"❌ PDF processing failed: {data.get('error')}")
+                return False
             print("✅ PDF upload successful!")
             print(f"   Document ID: {data.get('doc_id')}")
             print(f"   Filename: {data.get('filename')}")